@@ -1,112 +1,984 @@
 import asyncio
+import hashlib
+import importlib.util
+import io
+import logging
 import os
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
 from dotenv import load_dotenv
-from typing import Optional, Dict, Any
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, Callable, Awaitable, Iterator, AsyncIterator, Tuple, Union
+from langchain_core.messages import (
+    AIMessageChunk,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    get_buffer_string,
+)
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.tools import BaseTool, StructuredTool, tool
 from langchain_mcp_adapters.client import MultiServerMCPClient
-from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from langgraph.prebuilt import ToolNode, create_react_agent
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
 from langchain_anthropic import ChatAnthropic
+from langchain_anthropic.chat_models import convert_to_anthropic_tool
+import anthropic
+import httpx
 import boto3
 import json
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 load_dotenv()
-checkpointer = InMemorySaver()
+
+
+def _json_dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    """Serialize to JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_SORT_KEYS if sort_keys else None)
+    return json.dumps(obj, default=str, sort_keys=sort_keys).encode()
+
+
+def _json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+
+class DeltaSaver(BaseCheckpointSaver):
+    """
+    In-memory checkpointer that stores, for each checkpoint, only the messages
+    appended since the thread's previous checkpoint. The full message list is
+    rebuilt on read by walking back through those deltas.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        # (thread_id, checkpoint_ns) -> {checkpoint_id: entry}, oldest first
+        self.storage: Dict[Tuple[str, str], Dict[str, Dict[str, Any]]] = defaultdict(dict)
+        # (thread_id, checkpoint_ns, checkpoint_id) -> {(task_id, idx): (task_id, channel, value, task_path)}
+        self.writes: Dict[Tuple[str, str, str], Dict[Tuple[str, int], Tuple]] = defaultdict(dict)
+        # (thread_id, checkpoint_ns) -> (head checkpoint_id, its messages as last put or read)
+        self._head_messages: Dict[Tuple[str, str], Tuple[str, list]] = {}
+    
+    def _load_messages(self, checkpoints: Dict[str, Dict[str, Any]], checkpoint_id: str) -> list:
+        """Concatenate the message deltas from the first full list up to checkpoint_id"""
+        suffixes = []
+        while checkpoint_id is not None:
+            entry = checkpoints[checkpoint_id]
+            suffixes.append(entry["messages"])
+            checkpoint_id = entry["base_id"]
+        
+        messages = []
+        for suffix in reversed(suffixes):
+            messages.extend(self.serde.loads_typed(suffix))
+        return messages
+    
+    def _to_tuple(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> CheckpointTuple:
+        checkpoints = self.storage[(thread_id, checkpoint_ns)]
+        entry = checkpoints[checkpoint_id]
+        
+        checkpoint = self.serde.loads_typed(entry["checkpoint"])
+        if entry["messages"] is not None:
+            messages = self._load_messages(checkpoints, checkpoint_id)
+            checkpoint["channel_values"]["messages"] = messages
+            if checkpoint_id == next(reversed(checkpoints)):
+                # The run resuming from the head carries these objects into its next put
+                self._head_messages[(thread_id, checkpoint_ns)] = (checkpoint_id, list(messages))
+        
+        parent_config = None
+        if entry["parent_id"]:
+            parent_config = {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": entry["parent_id"],
+                }
+            }
+        
+        writes = self.writes[(thread_id, checkpoint_ns, checkpoint_id)].values()
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=checkpoint,
+            metadata=entry["metadata"],
+            parent_config=parent_config,
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed(value))
+                for task_id, channel, value, _ in writes
+            ],
+        )
+    
+    def get_tuple(self, config) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoints = self.storage.get((thread_id, checkpoint_ns))
+        if not checkpoints:
+            return None
+        
+        checkpoint_id = get_checkpoint_id(config) or max(checkpoints)
+        if checkpoint_id not in checkpoints:
+            return None
+        return self._to_tuple(thread_id, checkpoint_ns, checkpoint_id)
+    
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"] if config else None
+        checkpoint_ns = config["configurable"].get("checkpoint_ns") if config else None
+        checkpoint_id = get_checkpoint_id(config) if config else None
+        before_id = get_checkpoint_id(before) if before else None
+        
+        for (tid, ns), checkpoints in list(self.storage.items()):
+            if thread_id is not None and tid != thread_id:
+                continue
+            if checkpoint_ns is not None and ns != checkpoint_ns:
+                continue
+            
+            for cid in sorted(checkpoints, reverse=True):
+                if checkpoint_id and cid != checkpoint_id:
+                    continue
+                if before_id and cid >= before_id:
+                    continue
+                metadata = checkpoints[cid]["metadata"]
+                if filter and not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                if limit is not None and limit <= 0:
+                    return
+                if limit is not None:
+                    limit -= 1
+                yield self._to_tuple(tid, ns, cid)
+    
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoints = self.storage[(thread_id, checkpoint_ns)]
+        
+        channel_values = dict(checkpoint["channel_values"])
+        messages = channel_values.pop("messages", None)
+        
+        # Only store the suffix if the head checkpoint's messages are an unchanged prefix
+        # of ours. Messages replaced by id (e.g. update_state) fail the check, as do
+        # heads whose messages this saver hasn't seen, and get a full store instead.
+        base_id = None
+        suffix = messages
+        head = self._head_messages.get((thread_id, checkpoint_ns))
+        if messages is not None and checkpoints and head is not None:
+            head_id, head_messages = head
+            count = len(head_messages)
+            if (
+                head_id == next(reversed(checkpoints))
+                and count
+                and len(messages) >= count
+                and all(a is b or a == b for a, b in zip(messages, head_messages))
+            ):
+                base_id = head_id
+                suffix = messages[count:]
+        
+        checkpoints[checkpoint["id"]] = {
+            "checkpoint": self.serde.dumps_typed({**checkpoint, "channel_values": channel_values}),
+            "metadata": dict(metadata),
+            "parent_id": config["configurable"].get("checkpoint_id"),
+            "base_id": base_id,
+            "messages": self.serde.dumps_typed(suffix) if messages is not None else None,
+        }
+        if messages is not None:
+            self._head_messages[(thread_id, checkpoint_ns)] = (checkpoint["id"], list(messages))
+        else:
+            self._head_messages.pop((thread_id, checkpoint_ns), None)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+    
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        outer = self.writes[(thread_id, checkpoint_ns, checkpoint_id)]
+        
+        for idx, (channel, value) in enumerate(writes):
+            inner_key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+            if inner_key[1] >= 0 and inner_key in outer:
+                continue
+            outer[inner_key] = (task_id, channel, self.serde.dumps_typed(value), task_path)
+    
+    def delete_thread(self, thread_id: str):
+        for key in [key for key in self.storage if key[0] == thread_id]:
+            del self.storage[key]
+        for key in [key for key in self.writes if key[0] == thread_id]:
+            del self.writes[key]
+        for key in [key for key in self._head_messages if key[0] == thread_id]:
+            del self._head_messages[key]
+    
+    async def aget_tuple(self, config) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+    
+    async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator[CheckpointTuple]:
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+    
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return self.put(config, checkpoint, metadata, new_versions)
+    
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return self.put_writes(config, writes, task_id, task_path)
+    
+    async def adelete_thread(self, thread_id: str):
+        return self.delete_thread(thread_id)
+
+
+class DeferredSaver(DeltaSaver):
+    """
+    DeltaSaver that holds checkpoints back until flush() is called, so only
+    the last checkpoint of a run is stored instead of one per super-step
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+    
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        
+        # Replace any earlier checkpoint of this run, along with its writes. The
+        # parent stays the one the run started from, since that is the last stored one
+        pending = self._pending.setdefault(thread_id, {})
+        previous = pending.get(checkpoint_ns)
+        pending[checkpoint_ns] = {
+            "checkpoint_id": checkpoint["id"],
+            "parent_id": previous["parent_id"] if previous else config["configurable"].get("checkpoint_id"),
+            "put": (config, checkpoint, metadata, new_versions),
+            "writes": [],
+        }
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+    
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        pending = self._pending.get(thread_id, {}).get(checkpoint_ns)
+        
+        if pending and pending["checkpoint_id"] == config["configurable"]["checkpoint_id"]:
+            pending["writes"].append((config, writes, task_id, task_path))
+        else:
+            super().put_writes(config, writes, task_id, task_path)
+    
+    def flush(self, thread_id: str):
+        """Store the latest pending checkpoint (and its writes) for a thread"""
+        for pending in self._pending.pop(thread_id, {}).values():
+            config, checkpoint, metadata, new_versions = pending["put"]
+            config = {
+                **config,
+                "configurable": {**config["configurable"], "checkpoint_id": pending["parent_id"]},
+            }
+            super().put(config, checkpoint, metadata, new_versions)
+            for write in pending["writes"]:
+                super().put_writes(*write)
+    
+    def delete_thread(self, thread_id: str):
+        self._pending.pop(thread_id, None)
+        super().delete_thread(thread_id)
+
+
+class ShardedSaver(BaseCheckpointSaver):
+    """
+    Spreads threads over several DeferredSaver shards, each behind its own lock,
+    so concurrent conversations don't contend on a single store
+    """
+    
+    def __init__(self, num_shards: Optional[int] = None):
+        super().__init__()
+        num_shards = num_shards or os.cpu_count() or 1
+        self._shards = [DeferredSaver() for _ in range(num_shards)]
+        self._locks = [threading.Lock() for _ in range(num_shards)]
+    
+    def _index(self, thread_id: str) -> int:
+        return hash(thread_id) % len(self._shards)
+    
+    def _shard_for(self, config) -> Tuple[DeferredSaver, threading.Lock]:
+        i = self._index(config["configurable"]["thread_id"])
+        return self._shards[i], self._locks[i]
+    
+    def get_tuple(self, config) -> Optional[CheckpointTuple]:
+        shard, lock = self._shard_for(config)
+        with lock:
+            return shard.get_tuple(config)
+    
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator[CheckpointTuple]:
+        if config and "thread_id" in config.get("configurable", {}):
+            shards = [self._shard_for(config)]
+        else:
+            shards = list(zip(self._shards, self._locks))
+        
+        for shard, lock in shards:
+            with lock:
+                items = list(shard.list(config, filter=filter, before=before, limit=limit))
+            for item in items:
+                if limit is not None and limit <= 0:
+                    return
+                if limit is not None:
+                    limit -= 1
+                yield item
+    
+    def put(self, config, checkpoint, metadata, new_versions):
+        shard, lock = self._shard_for(config)
+        with lock:
+            return shard.put(config, checkpoint, metadata, new_versions)
+    
+    def put_writes(self, config, writes, task_id, task_path=""):
+        shard, lock = self._shard_for(config)
+        with lock:
+            shard.put_writes(config, writes, task_id, task_path)
+    
+    def flush(self, thread_id: str):
+        i = self._index(thread_id)
+        with self._locks[i]:
+            self._shards[i].flush(thread_id)
+    
+    def delete_thread(self, thread_id: str):
+        i = self._index(thread_id)
+        with self._locks[i]:
+            self._shards[i].delete_thread(thread_id)
+    
+    async def aget_tuple(self, config) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+    
+    async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator[CheckpointTuple]:
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+    
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return self.put(config, checkpoint, metadata, new_versions)
+    
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return self.put_writes(config, writes, task_id, task_path)
+    
+    async def adelete_thread(self, thread_id: str):
+        return self.delete_thread(thread_id)
+
+
+checkpointer = ShardedSaver()
+
+
+def _content_text(content) -> str:
+    """Text of a message content that is either a string or a list of content blocks"""
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block.get("text", "") if isinstance(block, dict) else block
+        for block in content
+    )
+
+
+_SUMMARY_PROMPT = (
+    "Summarize the conversation below between a user and an AI assistant. Keep every fact, "
+    "document name and source the assistant relied on, and any open questions from the user."
+)
+# Id prefix marking the summary message written by the hook
+_SUMMARY_ID_PREFIX = "conversation-summary-"
+
+
+def summarize_if_over(
+    llm: ChatAnthropic,
+    budget: int = 4000,
+    max_messages: int = 10,
+    prefix_tokens: int = 0,
+):
+    """
+    Build a pre-model hook that folds older messages into a single summary once the
+    conversation exceeds the token budget, keeping the most recent messages as they are
+    
+    Args:
+        llm: Model used to write the summary
+        budget: Approximate token count above which the history is compacted
+        max_messages: Number of recent messages kept verbatim
+        prefix_tokens: Tokens already taken by the fixed system prompt
+    """
+    async def hook(state: Dict[str, Any]) -> Dict[str, Any]:
+        messages = state["messages"]
+        if (
+            len(messages) <= max_messages
+            or prefix_tokens + count_tokens_approximately(messages) <= budget
+        ):
+            return {}
+        
+        # Start the kept window on a user message so tool calls stay paired with their results
+        split = len(messages) - max_messages
+        while split > 0 and not isinstance(messages[split], HumanMessage):
+            split -= 1
+        # Nothing to fold in besides an earlier summary
+        if split == 0 or (split == 1 and str(messages[0].id).startswith(_SUMMARY_ID_PREFIX)):
+            return {}
+        
+        summary = await llm.ainvoke([
+            SystemMessage(content=_SUMMARY_PROMPT),
+            HumanMessage(content=get_buffer_string(messages[:split])),
+        ])
+        
+        # Rewrite the stored history so the summary is kept in the checkpoint
+        return {
+            "messages": [
+                RemoveMessage(id=REMOVE_ALL_MESSAGES),
+                HumanMessage(
+                    content=f"Summary of the earlier conversation:\n{_content_text(summary.content)}",
+                    id=f"{_SUMMARY_ID_PREFIX}{uuid.uuid4()}",
+                ),
+                *messages[split:],
+            ]
+        }
+    
+    return hook
+
+
+@lru_cache(maxsize=1)
+def _http_client() -> httpx.AsyncClient:
+    """Keep-alive HTTP/2 connection pool shared by every LLM in the process"""
+    options = dict(
+        limits=httpx.Limits(max_keepalive_connections=32, keepalive_expiry=300),
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
+    try:
+        return httpx.AsyncClient(http2=True, **options)
+    except ImportError:
+        # HTTP/2 needs the optional h2 package (httpx[http2]), fall back to HTTP/1.1
+        return httpx.AsyncClient(**options)
+
+
+@lru_cache(maxsize=8)
+def _build_llm(model: str, temperature: float, api_key: Optional[str]) -> ChatAnthropic:
+    """Build a ChatAnthropic model once per process for each (model, temperature, key)"""
+    llm = ChatAnthropic(
+        model=model,
+        temperature=temperature,
+        api_key=api_key,
+        default_headers={"anthropic-beta": "prompt-caching-2024-07-31"},
+    )
+    # ChatAnthropic has no http client argument, so seed its cached async client with ours.
+    # _client_params / _async_client are langchain-anthropic internals (checked against 0.3.x);
+    # if they are missing the model keeps its own client
+    client_params = getattr(llm, "_client_params", None)
+    if isinstance(client_params, dict):
+        llm._async_client = anthropic.AsyncAnthropic(**client_params, http_client=_http_client())
+    return llm
+
+
+async def aclose_llm_clients():
+    """Close the shared HTTP connection pool and drop the cached models"""
+    if _http_client.cache_info().currsize:
+        await _http_client().aclose()
+    _http_client.cache_clear()
+    _build_llm.cache_clear()
+
+
+class BoundedToolNode(ToolNode):
+    """
+    ToolNode that runs the tool calls of one LLM turn concurrently, with at most
+    max_concurrency in flight to stay under the Bedrock Knowledge Base rate limits
+    """
+    
+    def __init__(self, tools, max_concurrency: int = 8, **kwargs):
+        super().__init__(tools, **kwargs)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def _arun_one(self, *args, **kwargs):
+        async with self._semaphore:
+            return await super()._arun_one(*args, **kwargs)
+
+
+# Extra status line shown when a tool is called
+_TOOL_STATUS = {
+    "retrieve_documents": "   📚 Searching Bedrock Knowledge Base...",
+    "retrieve_documents_batch": "   📚 Running several Bedrock Knowledge Base searches...",
+    "get_knowledge_base_info": "   ℹ️ Getting knowledge base information...",
+}
+
+
+def _report_tool_call(agent: "BedrockAgent", tool_name: str):
+    agent._status(f"🔍 Using tool: {tool_name}")
+    detail = _TOOL_STATUS.get(tool_name)
+    if detail:
+        agent._status(detail)
+
+
+def _on_agent_message(agent: "BedrockAgent", message, messages: list):
+    """Accumulate streamed LLM chunks and report the tools the LLM decided to call"""
+    if not isinstance(message, AIMessageChunk):
+        # Model output that was not streamed arrives as a whole message
+        messages.append(message)
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            _report_tool_call(agent, tool_call["name"])
+        return
+    
+    if messages and isinstance(messages[-1], AIMessageChunk) and messages[-1].id == message.id:
+        messages[-1] = messages[-1] + message
+    else:
+        messages.append(message)
+    
+    # The first chunk of each tool call carries its name
+    for tool_call_chunk in message.tool_call_chunks:
+        if tool_call_chunk.get("name"):
+            _report_tool_call(agent, tool_call_chunk["name"])
+
+
+def _on_tools_message(agent: "BedrockAgent", message, messages: list):
+    """Report that a tool result is back"""
+    messages.append(message)
+    agent._status("   ✅ Analysis complete, synthesizing response...")
+
+
+# Graph node name -> handler for the messages it streams
+_NODE_HANDLERS = {
+    "agent": _on_agent_message,
+    "tools": _on_tools_message,
+}
+
+
+# Server functions exposed as tools when the server is imported in-process
+_INPROC_TOOL_NAMES = ("retrieve_documents", "retrieve_documents_batch", "get_knowledge_base_info")
+
+
+def _import_server_module(server_script_path: str):
+    """Import the MCP server script as a module (reusing it if already imported)"""
+    module_name = Path(server_script_path).stem
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    
+    spec = importlib.util.spec_from_file_location(module_name, server_script_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    
+    # The server (and FastMCP) set up root logging on import; keep the agent's own setup
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        # Don't leave a half-initialized module behind for the next attempt
+        sys.modules.pop(module_name, None)
+        raise
+    finally:
+        root.handlers[:] = handlers
+        root.setLevel(level)
+    return module
+
+
+class ToolResultCache:
+    """LRU cache of tool results with a time-to-live, keyed by tool name and arguments"""
+    
+    def __init__(self, maxsize: int = 512, ttl: float = 600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[bytes, Tuple[float, Any]]" = OrderedDict()
+    
+    @staticmethod
+    def key(tool_name: str, args: Dict[str, Any]) -> bytes:
+        payload = _json_dumps([tool_name, args], sort_keys=True)
+        return hashlib.blake2b(payload, digest_size=16).digest()
+    
+    def get(self, key: bytes) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+    
+    def put(self, key: bytes, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def clear(self):
+        self._entries.clear()
+
+
+def _is_error_result(result: Any) -> bool:
+    """
+    Whether a tool result is the server's {"error": ...} payload, either as a dict or,
+    for MCP tools, as JSON in a text content block
+    """
+    if isinstance(result, dict):
+        return "error" in result
+    blocks = [result] if isinstance(result, str) else result if isinstance(result, list) else []
+    for block in blocks:
+        text = block.get("text") if isinstance(block, dict) else block
+        if not isinstance(text, str):
+            continue
+        try:
+            payload = _json_loads(text)
+        except ValueError:
+            continue
+        if isinstance(payload, dict) and "error" in payload:
+            return True
+    return False
+
+
+def _caching_tool(inner: BaseTool, cache: ToolResultCache) -> BaseTool:
+    """Wrap a tool so repeated calls with the same arguments are served from the cache"""
+    async def _call(**kwargs):
+        key = ToolResultCache.key(inner.name, kwargs)
+        hit, result = cache.get(key)
+        if hit:
+            return result
+        
+        result = await inner.ainvoke(kwargs)
+        # The server reports failures as {"error": ...} instead of raising, don't keep those
+        if not _is_error_result(result):
+            cache.put(key, result)
+        return result
+    
+    return StructuredTool(
+        name=inner.name,
+        description=inner.description,
+        args_schema=inner.args_schema,
+        coroutine=_call,
+    )
+
+
+# On-disk cache of MCP tool schemas, keyed by server script path + mtime. Each entry
+# records its script path so older entries for the same script can be dropped
+_TOOLS_CACHE_PATH = Path.home() / ".cache" / "bedrock_agent" / "tools.json"
+
+
+def _tools_cache_key(server_script_path: str) -> str:
+    """Cache key that changes whenever the server script is edited"""
+    path = os.path.abspath(server_script_path)
+    mtime = os.path.getmtime(path)
+    return hashlib.sha256(f"{path}:{mtime}".encode()).hexdigest()
+
+
+def _read_tools_cache() -> Dict[str, Any]:
+    try:
+        with open(_TOOLS_CACHE_PATH, "rb") as f:
+            return _json_loads(f.read())
+    except (OSError, ValueError):
+        return {}
+
+
+def _tool_args_schema(tool: BaseTool) -> Dict[str, Any]:
+    if isinstance(tool.args_schema, dict):
+        return tool.args_schema
+    return tool.args_schema.model_json_schema()
+
+
+def _cached_tool_specs(key: str) -> Optional[List[Dict[str, Any]]]:
+    """Tool schemas cached under the given key, if any"""
+    entry = _read_tools_cache().get(key)
+    return entry.get("tools") if isinstance(entry, dict) else None
+
+
+def _write_tools_cache(key: str, server_script_path: str, tools: List[BaseTool]):
+    """Persist the tool schemas returned by the MCP server under the given key"""
+    path = os.path.abspath(server_script_path)
+    # Replace entries for earlier versions of the same script (and any in the old list format)
+    cache = {
+        k: entry for k, entry in _read_tools_cache().items()
+        if isinstance(entry, dict) and entry.get("path") != path
+    }
+    cache[key] = {
+        "path": path,
+        "tools": [
+            {"name": t.name, "description": t.description, "args_schema": _tool_args_schema(t)}
+            for t in tools
+        ],
+    }
+    try:
+        _TOOLS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(_TOOLS_CACHE_PATH, "wb") as f:
+            f.write(_json_dumps(cache))
+    except OSError as e:
+        print(f"⚠️ Could not write tools cache: {e}")
 
 class BedrockAgent:
     """
     LangGraph agent that connects to Bedrock MCP server for knowledge base retrieval
     """
     
-    def __init__(self, server_script_path: str):
+    def __init__(self, server_script_path: str, inproc: bool = True, bypass_tool_cache: bool = False):
         """
         Initialize the agent with Anthropic LLM
         
         Args:
             server_script_path: Path to the BedrockMCPServer.py file
+            inproc: Import the server's tool functions directly instead of
+                talking to it over MCP stdio (set False for external servers)
+            bypass_tool_cache: Always call the tools instead of reusing cached results
         """
         self.server_script_path = server_script_path
+        self.inproc = inproc
+        self.bypass_tool_cache = bypass_tool_cache
+        self._tool_cache = ToolResultCache()
+        self._server = None
         
-        # Initialize LLM - using Anthropic API
-        self.llm = ChatAnthropic(
-            model="claude-3-5-sonnet-20241022",  # or claude-3-opus-latest
-            temperature=0,
-            api_key=os.getenv("ANTHROPIC_API_KEY"),
+        # Initialize LLM - using Anthropic API (shared with other agents in the process)
+        self.llm = _build_llm(
+            "claude-3-5-sonnet-20241022",  # or claude-3-opus-latest
+            0,
+            os.getenv("ANTHROPIC_API_KEY"),
         )
         
+        # Cheaper model used to summarize long conversations
+        self.summary_llm = _build_llm("claude-3-haiku-20240307", 0, os.getenv("ANTHROPIC_API_KEY"))
+        
         # Initialize MCP client
-        self.mcp_client = MultiServerMCPClient({
-            "bedrockServer": {
-                "command": "python",
-                "args": [server_script_path],
-                "transport": "stdio",
-            }
-        })
+        self.mcp_client = None
+        if not inproc:
+            self.mcp_client = MultiServerMCPClient({
+                "bedrockServer": {
+                    "command": "python",
+                    "args": [server_script_path],
+                    "transport": "stdio",
+                }
+            })
+        # Status lines are written per line on a terminal, in batches when piped
+        self._buf = io.StringIO()
+        self._tty = sys.stdout.isatty()
+        
+        self._live_tools: Optional[Dict[str, BaseTool]] = None
+        self._tools_fut: Optional[asyncio.Future] = None
+        
+        # Overlap the MCP server start-up with the rest of the setup when we can
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass  # No event loop yet, setup_tools_and_prompt starts it instead
+        else:
+            self.start_warmup()
+    
+    def start_warmup(self):
+        """Start the MCP server and list its tools in the background"""
+        if self.mcp_client is not None and self._tools_fut is None:
+            self._tools_fut = asyncio.ensure_future(self.mcp_client.get_tools())
+            self._tools_fut.add_done_callback(self._on_warmup_done)
+    
+    def _on_warmup_done(self, fut: asyncio.Future):
+        """Forget a failed warmup so the next tool call retries it"""
+        # Retrieving the exception also keeps asyncio from logging it as never retrieved
+        if not fut.cancelled() and fut.exception() is not None and self._tools_fut is fut:
+            self._tools_fut = None
+    
+    async def _get_live_tools(self) -> Dict[str, BaseTool]:
+        """Connect to the MCP server and list its tools (only done once)"""
+        if self._live_tools is None:
+            self.start_warmup()
+            fut = self._tools_fut
+            try:
+                tools = await fut
+            except Exception:
+                if self._tools_fut is fut:
+                    self._tools_fut = None
+                raise
+            self._live_tools = {tool.name: tool for tool in tools}
+        return self._live_tools
+    
+    def _tool_stub(self, spec: Dict[str, Any]) -> BaseTool:
+        """Build a tool from a cached schema that connects to the MCP server on first call"""
+        name = spec["name"]
+        
+        async def _call(**kwargs):
+            live_tools = await self._get_live_tools()
+            return await live_tools[name].ainvoke(kwargs)
+        
+        return StructuredTool(
+            name=name,
+            description=spec["description"],
+            args_schema=spec["args_schema"],
+            coroutine=_call,
+        )
     
-    async def setup_tools_and_prompt(self, system_prompt: str):
+    async def setup_tools_and_prompt(self, system_prompt: Union[str, List[Dict[str, Any]]]):
         """
         Set up the LangGraph agent with MCP tools from Bedrock server
         
         Args:
-            system_prompt: System prompt for the agent
+            system_prompt: System prompt for the agent, either a string or a list
+                of Anthropic content blocks
         """
-        # Get tools from MCP server
-        tools = await self.mcp_client.get_tools()
+        if self.inproc:
+            # Call the server's tool functions directly, skipping the MCP transport
+            server = _import_server_module(self.server_script_path)
+            # No MCP lifespan runs in-process, so open the server's Bedrock client here
+            await server.rag_system.initialize()
+            self._server = server
+            tools = [tool(getattr(server, name)) for name in _INPROC_TOOL_NAMES]
+            print(f"Loaded in-process tools: {[t.name for t in tools]}")
+        else:
+            self.start_warmup()
+            
+            # Get tools from the cache if the server script hasn't changed, else from MCP server
+            cache_key = _tools_cache_key(self.server_script_path)
+            cached_specs = _cached_tool_specs(cache_key)
+            
+            if cached_specs:
+                tools = [self._tool_stub(spec) for spec in cached_specs]
+                print(f"Loaded cached MCP tools: {[t.name for t in tools]}")
+            else:
+                tools = list((await self._get_live_tools()).values())
+                _write_tools_cache(cache_key, self.server_script_path, tools)
+                print(f"Connected to MCP server with tools: {[t.name for t in tools]}")
         
-        print(f"Connected to MCP server with tools: {[tool.name for tool in tools]}")
+        # In-process tools already go through the server's own search cache
+        if not (self.bypass_tool_cache or self.inproc):
+            tools = [_caching_tool(t, self._tool_cache) for t in tools]
+        
+        # Mark the tool schemas and system prompt as cacheable prompt prefixes. cache_control
+        # goes on the Anthropic tool dicts (BaseTool.extras needs langchain-core 1.2), and the
+        # model is bound to them up front while the ToolNode keeps the BaseTools
+        model = self.llm
+        if tools:
+            tool_specs = [convert_to_anthropic_tool(t) for t in tools]
+            tool_specs[-1] = {**tool_specs[-1], "cache_control": {"type": "ephemeral"}}
+            model = self.llm.bind_tools(tool_specs)
+        if isinstance(system_prompt, str):
+            system_prompt = [
+                {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}
+            ]
+        
+        # The system prompt is fixed, so build its message and measure it once
+        self._sys_block = SystemMessage(content=system_prompt)
+        self._sys_tokens = count_tokens_approximately([self._sys_block])
         
         # Create LangGraph ReAct agent
         self.agent = create_react_agent(
-            self.llm, 
-            tools, 
-            prompt=system_prompt, 
-            checkpointer=checkpointer
+            model, 
+            BoundedToolNode(tools), 
+            prompt=lambda state: [self._sys_block, *state["messages"]], 
+            checkpointer=checkpointer,
+            pre_model_hook=summarize_if_over(self.summary_llm, prefix_tokens=self._sys_tokens),
         )
     
-    async def chat(self, message: str, thread_id: str = "1") -> dict:
+    def _status(self, msg: str):
+        """Queue a status line for stdout"""
+        self._buf.write(msg + "\n")
+        if self._tty:
+            self._flush_status()
+    
+    def _flush_status(self):
+        """Write queued status lines to stdout"""
+        if self._buf.tell():
+            sys.stdout.write(self._buf.getvalue())
+            sys.stdout.flush()
+            self._buf.seek(0)
+            self._buf.truncate()
+    
+    async def chat(
+        self,
+        message: str,
+        thread_id: str = "1",
+        on_token: Optional[Callable[[str], Awaitable[None]]] = None,
+    ) -> dict:
         """
         Send a message to the agent and get a response with streaming
         
         Args:
             message: User message
             thread_id: Conversation thread ID for memory
+            on_token: Optional coroutine called with each text token the LLM streams
         """
         config = {"configurable": {"thread_id": thread_id}}
+        inputs = {"messages": [{"role": "user", "content": message}]}
         
         try:
-            print(f"🤖 Processing: {message}\n")
+            self._status(f"🤖 Processing: {message}\n")
+            self._status("🤔 Analyzing your question...")
             
-            # Stream events to show thinking
-            final_response = None
-            async for event in self.agent.astream_events(
-                {"messages": [{"role": "user", "content": message}]},
-                config,
-                version="v2"
-            ):
-                if event["event"] == "on_llm_start":
-                    print("🤔 Analyzing your question...")
-                    
-                elif event["event"] == "on_tool_start":
-                    tool_name = event["name"]
-                    print(f"🔍 Using tool: {tool_name}")
-                    
-                    if tool_name == "retrieve_documents":
-                        print("   📚 Searching Bedrock Knowledge Base...")
-                    elif tool_name == "get_knowledge_base_info":
-                        print("   ℹ️ Getting knowledge base information...")
-                        
-                elif event["event"] == "on_tool_end":
-                    print("   ✅ Analysis complete, synthesizing response...")
-                    
-                # Capture final response
-                if event["event"] == "on_chain_end":
-                    final_response = event.get("data", {}).get("output", {})
+            # "messages" mode yields (message chunk, metadata) tuples with no event envelope
+            messages = []
+            async for chunk, metadata in self.agent.astream(inputs, config, stream_mode="messages"):
+                node = metadata.get("langgraph_node")
+                if on_token and node == "agent" and isinstance(chunk, AIMessageChunk):
+                    text = _content_text(chunk.content)
+                    if text:
+                        await on_token(text)
+                
+                handler = _NODE_HANDLERS.get(node)
+                if handler:
+                    handler(self, chunk, messages)
+                    self._flush_status()
             
-            print("\n")  # New line after streaming
-            return final_response or {"messages": []}
+            self._status("\n")  # New line after streaming
+            return {"messages": messages}
             
         except Exception as e:
-            print(f"❌ Error: {e}")
+            self._status(f"❌ Error: {e}")
             raise
+        finally:
+            self._flush_status()
+            
+            # Write the end-of-run checkpoint
+            checkpointer.flush(thread_id)
+    
+    async def chat_batch(self, messages: List[str], max_concurrency: int = 8) -> List[dict]:
+        """
+        Send several independent messages to the agent concurrently
+        
+        Args:
+            messages: User messages, each run in its own conversation thread
+            max_concurrency: Maximum number of messages in flight at once
+            
+        Returns:
+            Responses in the same order as the messages
+        """
+        sem = asyncio.Semaphore(max_concurrency)
+        batch_id = uuid.uuid4().hex[:8]
+        
+        async def _one(message: str, thread_id: str) -> dict:
+            async with sem:
+                return await self.chat(message, thread_id=thread_id)
+        
+        return await asyncio.gather(
+            *[_one(message, f"batch-{batch_id}-{i}") for i, message in enumerate(messages)]
+        )
+    
+    def clear_tool_cache(self):
+        """Drop cached tool results (e.g. after the Knowledge Base is re-synced)"""
+        self._tool_cache.clear()
+        if self._server is not None:
+            self._server.rag_system.clear_cache()
+    
+    async def aclose(self):
+        """Cancel the MCP warmup if it is still running and close the in-process server"""
+        if self._tools_fut is not None and not self._tools_fut.done():
+            self._tools_fut.cancel()
+        if self._server is not None:
+            await self._server.rag_system.close()
     
     def format_response(self, response: Dict[str, Any]) -> str:
         """Format the agent response for display"""
@@ -115,22 +987,47 @@ class BedrockAgent:
         if hasattr(final_message, 'content'):
             content = final_message.content
             
-            if isinstance(content, str):
+            if content.__class__ is str:
                 return content
             elif isinstance(content, list):
-                text_parts = []
-                for item in content:
-                    if isinstance(item, dict) and 'text' in item:
-                        text_parts.append(item['text'])
-                    elif isinstance(item, str):
-                        text_parts.append(item)
-                return " ".join(text_parts)
+                return " ".join(
+                    item['text'] if isinstance(item, dict) else item
+                    for item in content
+                    if isinstance(item, str) or (isinstance(item, dict) and 'text' in item)
+                )
             else:
                 return str(content)
         else:
             return str(final_message)
 
 
+async def _ainput(prompt: str) -> str:
+    """
+    Read a line from stdin without blocking the event loop. The read runs on a daemon
+    thread (not the default executor, which asyncio.run waits for), so Ctrl-C at the
+    prompt still exits right away.
+    """
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+    
+    def _resolve(setter, value):
+        if not fut.done():
+            setter(value)
+    
+    def _read():
+        try:
+            result = (fut.set_result, input(prompt))
+        except Exception as e:
+            result = (fut.set_exception, e)
+        try:
+            loop.call_soon_threadsafe(_resolve, *result)
+        except RuntimeError:
+            pass  # The loop has already been closed
+    
+    threading.Thread(target=_read, daemon=True).start()
+    return await fut
+
+
 async def main():
     """Interactive chat session with the agent"""
     
@@ -161,28 +1058,37 @@ When answering questions:
 3. Provide a clear, comprehensive answer based on the sources
 4. Always mention which documents you're referencing"""
     
-    await agent.setup_tools_and_prompt(system_prompt)
-    
-    print("🚀 Bedrock Knowledge Base Agent is ready!")
-    print("Type 'quit' or 'exit' to end the conversation\n")
-    
-    while True:
-        user_input = input("\nYou: ").strip()
+    try:
+        await agent.setup_tools_and_prompt(system_prompt)
         
-        if user_input.lower() in ['quit', 'exit', 'q']:
-            print("👋 Goodbye!")
-            break
-        elif not user_input:
-            continue
+        print("🚀 Bedrock Knowledge Base Agent is ready!")
+        print("Type 'quit' or 'exit' to end the conversation\n")
         
-        try:
-            response = await agent.chat(user_input)
-            formatted_response = agent.format_response(response)
-            print(f"\nAgent: {formatted_response}")
-        except Exception as e:
-            print(f"\n❌ Error: {e}")
-            print("Please try again or check your configuration.")
+        while True:
+            # Read input off the event loop so background tasks keep running while the user types
+            user_input = (await _ainput("\nYou: ")).strip()
+            
+            if user_input.lower() in ['quit', 'exit', 'q']:
+                print("👋 Goodbye!")
+                break
+            elif not user_input:
+                continue
+            
+            try:
+                response = await agent.chat(user_input)
+                formatted_response = agent.format_response(response)
+                print(f"\nAgent: {formatted_response}")
+            except Exception as e:
+                print(f"\n❌ Error: {e}")
+                print("Please try again or check your configuration.")
+    finally:
+        await agent.aclose()
+        await aclose_llm_clients()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # Prefer the libuv event loop when it is installed
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -1,95 +1,128 @@
 import logging
 import os
+from contextlib import asynccontextmanager
 from mcp.server.fastmcp import FastMCP
 from typing import Any, Dict, List, Optional
-import boto3
+import aioboto3
+from aiobotocore.config import AioConfig
+from async_lru import alru_cache
 from dotenv import load_dotenv
 import json
 import asyncio
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[
-        logging.FileHandler("bedrock_server_debug.log"),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-# Initialize FastMCP
-mcp = FastMCP("BedrockKnowledgeBase")
 load_dotenv()
 
+KNOWLEDGE_BASE_ID = os.getenv("BEDROCK_KNOWLEDGE_BASE_ID")
+AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
+if not KNOWLEDGE_BASE_ID:
+    raise ValueError("BEDROCK_KNOWLEDGE_BASE_ID not set in environment variables")
+
+class _QueryKey(str):
+    """
+    Query text that hashes and compares by its stripped, lowercased form, so trivially
+    different phrasings share a cache entry while Bedrock still gets the text as typed
+    """
+    
+    def __new__(cls, text: str):
+        key = super().__new__(cls, text)
+        key._normalized = text.strip().lower()
+        return key
+    
+    def __hash__(self):
+        return hash(self._normalized)
+    
+    def __eq__(self, other):
+        return isinstance(other, _QueryKey) and self._normalized == other._normalized
+
 class BedrockKnowledgeBaseRAG:
     """RAG system using AWS Bedrock Knowledge Base"""
     
-    def __init__(self):
+    def __init__(self, max_parallel_requests: Optional[int] = None):
+        self._session = aioboto3.Session()
+        self._client_cm = None
         self.bedrock_agent_runtime = None
-        self.knowledge_base_id = os.getenv("BEDROCK_KNOWLEDGE_BASE_ID")
-        self.aws_region = os.getenv("AWS_REGION", "us-east-1")
-        self.initialized = False
+        self.knowledge_base_id = KNOWLEDGE_BASE_ID
+        self.aws_region = AWS_REGION
+        # Upper bound on concurrent retrieve requests (size of the HTTP connection pool)
+        self.max_parallel_requests = max_parallel_requests or int(
+            os.getenv("BEDROCK_MAX_PARALLEL", (os.cpu_count() or 1) * 5)
+        )
+        # Keeps fanned-out searches within the connection pool / Bedrock TPS
+        self._sem = asyncio.Semaphore(self.max_parallel_requests)
         
     async def initialize(self):
-        """Initialize the Bedrock client"""
-        if self.initialized:
+        """Open the Bedrock client; done once at startup, before any tool call"""
+        if self.bedrock_agent_runtime is not None:
             return
             
         logger.info("🚀 Initializing Bedrock Knowledge Base RAG system...")
         
         try:
-        # Initialize Bedrock Agent Runtime client
-            self.bedrock_agent_runtime = boto3.client(
-            'bedrock-agent-runtime',
-            region_name=self.aws_region
-        )
-        
-            if not self.knowledge_base_id:
-                raise ValueError("BEDROCK_KNOWLEDGE_BASE_ID not set in environment variables")
-        
-            self.initialized = True
-            logger.info(f"✅ Bedrock RAG system ready with Knowledge Base ID: {self.knowledge_base_id}")
-        
-            
-            if not self.knowledge_base_id:
-                raise ValueError("BEDROCK_KNOWLEDGE_BASE_ID not set in environment variables")
+            # Initialize Bedrock Agent Runtime client
+            self._client_cm = self._session.client(
+                'bedrock-agent-runtime',
+                region_name=self.aws_region,
+                config=AioConfig(
+                    max_pool_connections=self.max_parallel_requests,
+                    retries={'max_attempts': 10, 'mode': 'adaptive'},
+                    tcp_keepalive=True,
+                    connect_timeout=5,
+                    read_timeout=60
+                )
+            )
+            self.bedrock_agent_runtime = await self._client_cm.__aenter__()
+            self.clear_cache()
             
-            self.initialized = True
-            logger.info(f"✅ Bedrock RAG system ready with Knowledge Base ID: {self.knowledge_base_id}")
+            logger.info("✅ Bedrock RAG ready: kb_id=%s region=%s", self.knowledge_base_id, self.aws_region)
             
         except Exception as e:
-            logger.error(f"Failed to initialize Bedrock client: {e}")
+            logger.error("Failed to initialize Bedrock client: %s", e)
             raise
-    
 
+    async def close(self):
+        """Close the Bedrock client"""
+        if self._client_cm is not None:
+            await self._client_cm.__aexit__(None, None, None)
+            self._client_cm = None
+            self.bedrock_agent_runtime = None
+
+    async def retrieve_many(self, queries: List[str], limit: int = 5) -> List[Any]:
+        """Run several retrievals concurrently; a failed query's entry is its exception"""
+        async def _one(query: str):
+            async with self._sem:
+                return await self.retrieve(query, limit)
+
+        return await asyncio.gather(*[_one(q) for q in queries], return_exceptions=True)
 
-    async def search(self, query: str, limit: int = 5):
-        loop = asyncio.get_running_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: self.bedrock_agent_runtime.retrieve(
-                knowledgeBaseId=self.knowledge_base_id,
-                retrievalQuery={"text": query},
-                retrievalConfiguration={
-                    "vectorSearchConfiguration": {
-                        "numberOfResults": limit,
-                        "overrideSearchType": "HYBRID"
-                    }
+    def clear_cache(self):
+        """Drop cached search results (e.g. after the Knowledge Base is re-synced)"""
+        self._search_cached.cache_clear()
+
+    async def retrieve(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Raw Bedrock retrievalResults entries for a query"""
+        return await self._search_cached(_QueryKey(query), limit)
+
+    @alru_cache(maxsize=512, ttl=300)
+    async def _search_cached(self, query: str, limit: int):
+        response = await self.bedrock_agent_runtime.retrieve(
+            knowledgeBaseId=self.knowledge_base_id,
+            retrievalQuery={"text": str(query)},
+            retrievalConfiguration={
+                "vectorSearchConfiguration": {
+                    "numberOfResults": limit,
+                    "overrideSearchType": "HYBRID"
                 }
-            )
+            }
         )
 
-        # Optional: print or log the response for debug
-        print("Bedrock retrieve response:", response)
+        # stdout carries the MCP protocol stream, so debug output goes through the logger
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Bedrock retrieve response: %s", json.dumps(response, default=str))
 
-        results = []
-        for result in response.get("retrievalResults", []):
-            content = result.get("content", "")
-            source = result.get("location", {}).get("s3Location", {}).get("uri", "")
-            results.append({"content": content, "source": source})
-
-        return results
+        # Kept raw so the tools shape the rows in a single pass
+        return response.get("retrievalResults", [])
 
             
         # except Exception as e:
@@ -99,6 +132,37 @@ class BedrockKnowledgeBaseRAG:
 # Initialize RAG system
 rag_system = BedrockKnowledgeBaseRAG()
 
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    """Open the Bedrock client when the server starts and close it on shutdown"""
+    # A failure here stops the server instead of leaving it up without a client
+    await rag_system.initialize()
+    logger.info("🎯 Bedrock Knowledge Base MCP Server ready!")
+    try:
+        yield
+    finally:
+        await rag_system.close()
+
+# Initialize FastMCP. It configures root logging on construction; WARNING keeps that quiet
+# when the module is imported in-process, and script mode replaces it below
+mcp = FastMCP("BedrockKnowledgeBase", lifespan=lifespan, log_level="WARNING")
+
+def _format_results(results: List[Dict[str, Any]], max_chars: int = 800) -> List[Dict[str, Any]]:
+    """Shape raw retrievalResults entries for a tool response, truncating the content"""
+    formatted = []
+    for r in results:
+        source = ((r.get("location") or {}).get("s3Location") or {}).get("uri", "")
+        text = (r.get("content") or {}).get("text", "")
+        formatted.append({
+            "title": source.rsplit("/", 1)[-1],
+            "content": text if len(text) <= max_chars else text[:max_chars] + "...",
+            "source": source,
+            "url": source,
+            "relevance_score": round(r.get("score", 0.0) * 100, 1),
+            "metadata": r.get("metadata", {})
+        })
+    return formatted
+
 # MCP TOOLS
 
 @mcp.tool()
@@ -114,26 +178,12 @@ async def retrieve_documents(query: str, limit: int = 3) -> Dict[str, Any]:
         Dictionary with search results containing relevant document excerpts
     """
     try:
-        # Ensure RAG system is initialized
-        if not rag_system.initialized:
-            await rag_system.initialize()
-        
         # Perform search
-        results = await rag_system.search(query, min(limit, 10))
+        results = await rag_system.retrieve(query, min(limit, 10))
         
         return {
             "query": query,
-            "results": [
-                {
-                    "title": r['title'],
-                    "content": r['text'][:800] + "..." if len(r['text']) > 800 else r['text'],
-                    "source": r['source'],
-                    "url": r['url'],
-                    "relevance_score": round(r['similarity'] * 100, 1),
-                    "metadata": r.get('metadata', {})
-                }
-                for r in results
-            ],
+            "results": _format_results(results),
             "total_results": len(results),
             "source": "AWS Bedrock Knowledge Base"
         }
@@ -145,6 +195,39 @@ async def retrieve_documents(query: str, limit: int = 3) -> Dict[str, Any]:
             "results": []
         }
 
+@mcp.tool()
+async def retrieve_documents_batch(queries: List[str], limit: int = 3) -> Dict[str, Any]:
+    """
+    Run several searches against the AWS Bedrock Knowledge Base in parallel.
+    Use this instead of repeated retrieve_documents calls when a question
+    breaks down into independent sub-queries.
+    
+    Args:
+        queries: Search queries, one per sub-question
+        limit: Number of results to return per query (1-10, default 3)
+    
+    Returns:
+        Dictionary with the search results for each query
+    """
+    try:
+        batches = await rag_system.retrieve_many(queries, min(limit, 10))
+        
+        return {
+            "queries": [
+                {"query": query, "error": f"Search failed: {str(results)}", "results": []}
+                if isinstance(results, Exception)
+                else {"query": query, "results": _format_results(results), "total_results": len(results)}
+                for query, results in zip(queries, batches)
+            ],
+            "source": "AWS Bedrock Knowledge Base"
+        }
+    except Exception as e:
+        logger.error(f"Error in retrieve_documents_batch: {e}")
+        return {
+            "error": f"Search failed: {str(e)}",
+            "queries": [{"query": query, "results": []} for query in queries]
+        }
+
 @mcp.tool()
 async def get_knowledge_base_info() -> Dict[str, Any]:
     """
@@ -154,13 +237,10 @@ async def get_knowledge_base_info() -> Dict[str, Any]:
         Dictionary with knowledge base configuration and status
     """
     try:
-        if not rag_system.initialized:
-            await rag_system.initialize()
-        
         return {
             "knowledge_base_id": rag_system.knowledge_base_id,
             "aws_region": rag_system.aws_region,
-            "status": "connected" if rag_system.initialized else "disconnected",
+            "status": "connected" if rag_system.bedrock_agent_runtime is not None else "disconnected",
             "service": "AWS Bedrock Knowledge Base"
         }
     except Exception as e:
@@ -170,16 +250,19 @@ async def get_knowledge_base_info() -> Dict[str, Any]:
             "status": "error"
         }
 
-# Initialize on startup
-async def startup():
-    """Initialize RAG system when server starts"""
-    try:
-        await rag_system.initialize()
-        logger.info("🎯 Bedrock Knowledge Base MCP Server ready!")
-    except Exception as e:
-        logger.error(f"Startup error: {e}")
-
 if __name__ == "__main__":
+    # Configure logging here so importing the module (e.g. in-process from the agent) has no side
+    # effects; force replaces the handlers FastMCP installed
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [%(levelname)s] %(message)s',
+        handlers=[
+            logging.FileHandler("bedrock_server_debug.log"),
+            logging.StreamHandler()
+        ],
+        force=True
+    )
+    
     # Run the server
     mcp.run(transport='stdio')
     
\ No newline at end of file
@@ -9,22 +9,28 @@ import os
 import re
 import time
 import json
-import hashlib
+import tempfile
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from urllib.parse import urljoin, urlparse
 from datetime import datetime
-from typing import List, Dict, Optional, Set
+from typing import List, Dict, Optional, Set, BinaryIO
 import logging
 
 import boto3
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from lxml import html as lxml_html
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
 
 # Configure logging
 logging.basicConfig(
@@ -37,6 +43,57 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Read size for streamed downloads
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# Downloads larger than this are spooled to disk instead of memory
+SPOOL_MAX_SIZE = 32 * 1024 * 1024
+# PDFs above the multipart threshold are uploaded in parallel parts
+_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=8,
+    use_threads=True
+)
+# Progress log appends between fsyncs
+PROGRESS_FSYNC_INTERVAL = 32
+
+# Characters not allowed in S3 key name parts; ASCII text goes through the translate table
+_SAFE = re.compile(r'[^\w\-_.]')
+_TRANS = str.maketrans({c: '_' for c in map(chr, range(128)) if not (c.isalnum() or c in '-_.')})
+
+def _safe_name(text: str) -> str:
+    """Replace characters that are unsafe in an S3 key with underscores"""
+    if text.isascii():
+        return text.translate(_TRANS)
+    return _SAFE.sub('_', text)
+
+def _cell_text(element) -> str:
+    """Text of an element with each text node stripped, like BeautifulSoup's get_text(strip=True)"""
+    return ''.join(text.strip() for text in element.itertext())
+
+class RateLimiter:
+    """Thread-safe token bucket that limits how many requests start per second"""
+    
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a request may start"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
 class ISCCPDFScraper:
     def __init__(self, config: Dict):
         """
@@ -49,22 +106,48 @@ class ISCCPDFScraper:
         self.base_url = "https://www.iscc-system.org"
         self.certificates_url = f"{self.base_url}/certification/certificate-database/valid-certificates/"
         
-        # Initialize AWS S3 client
+        # Concurrency for the download/upload workers, shared state is guarded by _lock
+        self.download_concurrency = int(config.get('download_concurrency', 16))
+        self.upload_concurrency = int(config.get('upload_concurrency', 16))
+        self.upload_queue_size = int(config.get('upload_queue_size', 64))
+        self.rate_limiter = RateLimiter(float(config.get('requests_per_second', 20)))
+        self._lock = threading.Lock()
+        
+        # Initialize AWS S3 client, with a connection pool large enough for every worker
         self.s3_client = boto3.client(
             's3',
             aws_access_key_id=config.get('aws_access_key_id'),
             aws_secret_access_key=config.get('aws_secret_access_key'),
-            region_name=config.get('aws_region', 'us-east-1')
+            region_name=config.get('aws_region', 'us-east-1'),
+            config=Config(
+                max_pool_connections=max(64, (self.download_concurrency + self.upload_concurrency) * 2),
+                retries={'max_attempts': 10, 'mode': 'adaptive'},
+                tcp_keepalive=True,
+                connect_timeout=5,
+                read_timeout=60
+            )
         )
         self.s3_bucket = config['s3_bucket_name']
         
         # Initialize scraping service
         self.scraping_service = config.get('scraping_service', 'selenium').lower()
         
-        # Track processed PDFs to avoid duplicates
+        # Track processed PDF URLs to avoid duplicates. Each one is also appended to
+        # a line log as it completes; save_progress compacts the log into the JSON file
         self.processed_pdfs: Set[str] = set()
+        self._progress_log = config.get('progress_log_file', 'processed_pdfs.log')
+        self._progress_fp = open(self._progress_log, 'a', buffering=1)
+        self._unsynced = 0
+        
         self.session = requests.Session()
         
+        # Persistent Selenium driver and the XHR endpoint the certificate table is
+        # rendered from, captured on the first render so re-scrapes can skip Chrome
+        self._driver: Optional[webdriver.Chrome] = None
+        self._endpoint_file = config.get('endpoint_cache_file', 'iscc_endpoint.json')
+        self._endpoint: Optional[Dict] = None
+        self._load_endpoint()
+        
         # Setup headers to mimic a real browser
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -75,8 +158,30 @@ class ISCCPDFScraper:
             'Upgrade-Insecure-Requests': '1'
         })
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Shut down the Selenium driver and the HTTP session"""
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            finally:
+                self._driver = None
+        self.session.close()
+        
+        if not self._progress_fp.closed:
+            os.fsync(self._progress_fp.fileno())
+            self._progress_fp.close()
+
     def setup_selenium_driver(self) -> webdriver.Chrome:
-        """Setup Chrome WebDriver with appropriate options"""
+        """Get the Chrome WebDriver, starting it with appropriate options on first use"""
+        if self._driver is not None:
+            return self._driver
+        
         chrome_options = Options()
         chrome_options.add_argument('--headless')
         chrome_options.add_argument('--no-sandbox')
@@ -84,8 +189,122 @@ class ISCCPDFScraper:
         chrome_options.add_argument('--disable-gpu')
         chrome_options.add_argument('--window-size=1920,1080')
         chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+        # Network events are read back from the performance log to find the table's XHR
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
         
-        return webdriver.Chrome(options=chrome_options)
+        self._driver = webdriver.Chrome(options=chrome_options)
+        self._driver.execute_cdp_cmd('Network.enable', {})
+        return self._driver
+
+    def _load_endpoint(self):
+        """Load a previously captured certificate table endpoint"""
+        try:
+            with open(self._endpoint_file, 'r') as f:
+                endpoint = json.load(f)
+            if endpoint.get('url'):
+                self._endpoint = endpoint
+        except (FileNotFoundError, ValueError, AttributeError):
+            pass
+
+    def _forget_endpoint(self):
+        """Drop a captured endpoint that stopped working, so the next render captures it again"""
+        self._endpoint = None
+        try:
+            os.remove(self._endpoint_file)
+        except FileNotFoundError:
+            pass
+
+    def _capture_endpoint(self, driver: webdriver.Chrome):
+        """
+        Find the XHR the certificate table was rendered from in the driver's
+        performance log and remember how to replay it (method, URL, headers and body)
+        
+        Args:
+            driver: Driver that has just rendered the certificates page
+        """
+        requests_sent = {}
+        for entry in driver.get_log('performance'):
+            message = json.loads(entry['message'])['message']
+            params = message.get('params', {})
+            
+            if message['method'] == 'Network.requestWillBeSent':
+                requests_sent[params['requestId']] = params['request']
+            elif (message['method'] == 'Network.responseReceived'
+                    and params.get('type') in ('XHR', 'Fetch')
+                    and 'json' in params['response'].get('mimeType', '')):
+                try:
+                    body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': params['requestId']})
+                    rows = self._json_rows(json.loads(body['body']))
+                except Exception:
+                    continue
+                if not rows:
+                    continue
+                
+                request = requests_sent.get(params['requestId'], {})
+                self._endpoint = {
+                    'url': params['response']['url'],
+                    'method': request.get('method', 'GET'),
+                    'headers': {
+                        k: v for k, v in request.get('headers', {}).items()
+                        if k.lower() not in ('cookie', 'content-length')
+                    },
+                    'post_data': request.get('postData'),
+                }
+                logger.info(f"Captured certificate table endpoint: {self._endpoint['method']} {self._endpoint['url']}")
+                
+                with open(self._endpoint_file, 'w') as f:
+                    json.dump(self._endpoint, f)
+                return
+
+    @staticmethod
+    def _json_rows(payload) -> Optional[List[List]]:
+        """
+        Get the table rows out of a DataTables-style JSON response. Only array rows
+        are accepted, since their cells are in the same order as the rendered columns.
+        """
+        if isinstance(payload, dict):
+            payload = payload.get('data', payload.get('aaData'))
+        if isinstance(payload, list) and all(isinstance(row, list) for row in payload):
+            return payload
+        return None
+
+    def scrape_with_endpoint(self, url: str) -> Optional[str]:
+        """
+        Fetch the certificate table straight from its captured JSON endpoint
+        
+        Args:
+            url: URL of the page the endpoint was captured from
+            
+        Returns:
+            HTML table built from the JSON rows, or None if failed
+        """
+        endpoint = self._endpoint
+        try:
+            response = self.session.request(
+                endpoint.get('method', 'GET'),
+                endpoint['url'],
+                headers={**endpoint.get('headers', {}), 'Referer': url},
+                data=endpoint.get('post_data'),
+                timeout=30
+            )
+            response.raise_for_status()
+            rows = self._json_rows(response.json())
+        except (requests.exceptions.RequestException, ValueError) as e:
+            rows = None
+            logger.warning(f"Certificate table endpoint failed: {e}")
+        
+        if not rows:
+            logger.warning("Forgetting the certificate table endpoint, falling back to Selenium")
+            self._forget_endpoint()
+            return None
+        
+        # Cells hold the same HTML fragments the page renders, so the result goes
+        # through extract_certificate_data like a rendered page would
+        body = ''.join(
+            '<tr>' + ''.join(f'<td>{cell}</td>' for cell in row) + '</tr>'
+            for row in rows
+        )
+        return f'<table><tr></tr>{body}</table>'
 
     def scrape_with_brightdata(self, url: str) -> Optional[str]:
         """
@@ -171,17 +390,24 @@ class ISCCPDFScraper:
         Returns:
             HTML content or None if failed
         """
-        driver = None
+        if url == self.certificates_url and self._endpoint:
+            html_content = self.scrape_with_endpoint(url)
+            if html_content:
+                return html_content
+        
         try:
             driver = self.setup_selenium_driver()
             driver.get(url)
             
-            # Wait for the certificate table to load
-            wait = WebDriverWait(driver, 20)
-            wait.until(EC.presence_of_element_located((By.TAG_NAME, "table")))
+            # Wait for the certificate table rows to be rendered, then for the
+            # DataTables row counter to stop changing
+            wait = WebDriverWait(driver, 20, poll_frequency=0.2,
+                                 ignored_exceptions=(StaleElementReferenceException,))
+            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "table tbody tr:last-child")))
+            wait.until(self._table_info_settled())
             
-            # Wait a bit more for dynamic content
-            time.sleep(3)
+            if url == self.certificates_url and not self._endpoint:
+                self._capture_endpoint(driver)
             
             return driver.page_source
             
@@ -191,9 +417,27 @@ class ISCCPDFScraper:
         except Exception as e:
             logger.error(f"Selenium scraping failed for {url}: {e}")
             return None
-        finally:
-            if driver:
-                driver.quit()
+
+    @staticmethod
+    def _table_info_settled():
+        """
+        Wait condition that holds once the .dataTables_info text (e.g. "Showing 1 to
+        50 of 5,000 entries") reads the same on two consecutive polls. Pages without
+        the counter are treated as settled.
+        """
+        last = [None]
+        
+        def settled(driver) -> bool:
+            infos = driver.find_elements(By.CSS_SELECTOR, '.dataTables_info')
+            if not infos:
+                return True
+            text = infos[0].text
+            if text and text == last[0]:
+                return True
+            last[0] = text
+            return False
+        
+        return settled
 
     def get_page_content(self, url: str) -> Optional[str]:
         """
@@ -224,52 +468,49 @@ class ISCCPDFScraper:
         Returns:
             List of certificate data dictionaries
         """
-        from bs4 import BeautifulSoup
-        
-        soup = BeautifulSoup(html_content, 'html.parser')
+        doc = lxml_html.fromstring(html_content)
         certificates = []
         
         # Find the certificate table
-        table = soup.find('table')
-        if not table:
+        tables = doc.xpath('//table')
+        if not tables:
             logger.warning("No certificate table found")
             return certificates
         
         # Extract table rows (skip header)
-        rows = table.find_all('tr')[1:]
+        rows = tables[0].xpath('.//tr')[1:]
         
         for row in rows:
-            cells = row.find_all(['td', 'th'])
+            cells = row.xpath('./td | ./th')
             if len(cells) < 5:  # Ensure we have enough columns
                 continue
                 
             # Extract certificate information
             cert_data = {
-                'certificate_number': cells[0].get_text(strip=True) if cells[0] else '',
-                'company_name': cells[1].get_text(strip=True) if cells[1] else '',
-                'country': cells[2].get_text(strip=True) if cells[2] else '',
-                'validity_period': cells[3].get_text(strip=True) if cells[3] else '',
-                'certification_body': cells[4].get_text(strip=True) if cells[4] else '',
+                'certificate_number': _cell_text(cells[0]),
+                'company_name': _cell_text(cells[1]),
+                'country': _cell_text(cells[2]),
+                'validity_period': _cell_text(cells[3]),
+                'certification_body': _cell_text(cells[4]),
                 'pdf_links': []
             }
             
             # Look for PDF links in the row
-            for cell in cells:
-                links = cell.find_all('a', href=True)
-                for link in links:
-                    href = link['href']
-                    if href.lower().endswith('.pdf'):
-                        # Convert relative URLs to absolute
-                        if href.startswith('/'):
-                            href = urljoin(self.base_url, href)
-                        elif not href.startswith('http'):
-                            href = urljoin(self.base_url, href)
-                        
-                        cert_data['pdf_links'].append({
-                            'url': href,
-                            'text': link.get_text(strip=True),
-                            'type': self.classify_pdf_type(link.get_text(strip=True))
-                        })
+            for link in row.xpath('./td//a[@href] | ./th//a[@href]'):
+                href = link.get('href')
+                if href.lower().endswith('.pdf'):
+                    # Convert relative URLs to absolute
+                    if href.startswith('/'):
+                        href = urljoin(self.base_url, href)
+                    elif not href.startswith('http'):
+                        href = urljoin(self.base_url, href)
+                    
+                    link_text = _cell_text(link)
+                    cert_data['pdf_links'].append({
+                        'url': href,
+                        'text': link_text,
+                        'type': self.classify_pdf_type(link_text)
+                    })
             
             if cert_data['pdf_links']:  # Only include certificates with PDF links
                 certificates.append(cert_data)
@@ -296,30 +537,45 @@ class ISCCPDFScraper:
         else:
             return 'unknown'
 
-    def download_pdf(self, pdf_url: str) -> Optional[bytes]:
+    def download_pdf(self, pdf_url: str) -> Optional[BinaryIO]:
         """
         Download PDF content
         
+        The body is streamed in 8 MB chunks into a spooled temporary file, which
+        stays in memory for typical PDFs and spills to disk for very large ones
+        
         Args:
             pdf_url: URL of the PDF to download
             
         Returns:
-            PDF content as bytes or None if failed
+            File object positioned at the start of the PDF, or None if failed.
+            The caller is responsible for closing it.
         """
+        buf = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
         try:
-            response = self.session.get(pdf_url, timeout=30)
-            response.raise_for_status()
+            with self.session.get(pdf_url, stream=True, timeout=30) as response:
+                response.raise_for_status()
+                # iter_content turns mid-body connection errors into RequestException
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    buf.write(chunk)
             
             # Verify content is actually a PDF
-            if not response.content.startswith(b'%PDF'):
+            buf.seek(0)
+            if buf.read(4) != b'%PDF':
                 logger.warning(f"Downloaded content is not a valid PDF: {pdf_url}")
+                buf.close()
                 return None
-                
-            return response.content
+            
+            buf.seek(0)
+            return buf
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to download PDF {pdf_url}: {e}")
+            buf.close()
             return None
+        except BaseException:
+            buf.close()
+            raise
 
     def generate_s3_key(self, cert_data: Dict, pdf_info: Dict) -> str:
         """
@@ -333,21 +589,19 @@ class ISCCPDFScraper:
             S3 key string
         """
         # Clean certificate number for filename
-        cert_num = re.sub(r'[^\w\-_.]', '_', cert_data['certificate_number'])
-        company = re.sub(r'[^\w\-_.]', '_', cert_data['company_name'][:50])  # Limit length
+        cert_num = _safe_name(cert_data['certificate_number'])
+        company = _safe_name(cert_data['company_name'][:50])  # Limit length
         pdf_type = pdf_info['type']
         
-        # Create timestamp
-        timestamp = datetime.now().strftime('%Y%m%d')
-        
-        return f"iscc_certificates/{timestamp}/{cert_num}_{company}_{pdf_type}.pdf"
+        # No date in the key, so later runs find PDFs that are already uploaded
+        return f"iscc_certificates/{cert_num}_{company}_{pdf_type}.pdf"
 
-    def upload_to_s3(self, pdf_content: bytes, s3_key: str, metadata: Dict) -> bool:
+    def upload_to_s3(self, pdf_content: BinaryIO, s3_key: str, metadata: Dict) -> bool:
         """
         Upload PDF to AWS S3
         
         Args:
-            pdf_content: PDF content as bytes
+            pdf_content: File object with the PDF content
             s3_key: S3 key for the object
             metadata: Metadata to attach to the object
             
@@ -355,18 +609,32 @@ class ISCCPDFScraper:
             True if successful, False otherwise
         """
         try:
-            self.s3_client.put_object(
-                Bucket=self.s3_bucket,
-                Key=s3_key,
-                Body=pdf_content,
-                ContentType='application/pdf',
-                Metadata=metadata
-            )
+            pdf_content.seek(0, os.SEEK_END)
+            size = pdf_content.tell()
+            pdf_content.seek(0)
+            
+            if size > _TRANSFER_CONFIG.multipart_threshold:
+                self.s3_client.upload_fileobj(
+                    Fileobj=pdf_content,
+                    Bucket=self.s3_bucket,
+                    Key=s3_key,
+                    ExtraArgs={'ContentType': 'application/pdf', 'Metadata': metadata},
+                    Config=_TRANSFER_CONFIG
+                )
+            else:
+                # A single PUT is faster than multipart for small files
+                self.s3_client.put_object(
+                    Bucket=self.s3_bucket,
+                    Key=s3_key,
+                    Body=pdf_content,
+                    ContentType='application/pdf',
+                    Metadata=metadata
+                )
             
             logger.info(f"Successfully uploaded to S3: {s3_key}")
             return True
             
-        except ClientError as e:
+        except (ClientError, S3UploadFailedError) as e:
             logger.error(f"Failed to upload to S3 {s3_key}: {e}")
             return False
 
@@ -385,6 +653,7 @@ class ISCCPDFScraper:
             'pdfs_found': 0,
             'pdfs_downloaded': 0,
             'pdfs_uploaded': 0,
+            'pdfs_skipped': 0,
             'errors': 0
         }
         
@@ -398,71 +667,204 @@ class ISCCPDFScraper:
         certificates = self.extract_certificate_data(html_content)
         stats['certificates_found'] = len(certificates)
         
-        pdf_count = 0
+        # Collect the PDFs to process
+        work = []
         for cert_data in certificates:
             for pdf_info in cert_data['pdf_links']:
-                if max_pdfs and pdf_count >= max_pdfs:
-                    logger.info(f"Reached maximum PDF limit: {max_pdfs}")
-                    return stats
+                if max_pdfs and len(work) >= max_pdfs:
+                    break
                 
                 pdf_url = pdf_info['url']
                 stats['pdfs_found'] += 1
                 
                 # Skip if already processed
-                url_hash = hashlib.md5(pdf_url.encode()).hexdigest()
-                if url_hash in self.processed_pdfs:
+                if pdf_url in self.processed_pdfs:
                     logger.info(f"Skipping already processed PDF: {pdf_url}")
                     continue
                 
-                logger.info(f"Processing PDF: {pdf_url}")
-                
-                # Download PDF
-                pdf_content = self.download_pdf(pdf_url)
-                if not pdf_content:
-                    stats['errors'] += 1
+                work.append((cert_data, pdf_info, self.generate_s3_key(cert_data, pdf_info)))
+        
+        if max_pdfs and len(work) >= max_pdfs:
+            logger.info(f"Reached maximum PDF limit: {max_pdfs}")
+        
+        # Downloads and uploads run in separate pools, and each PDF is handed to the
+        # upload pool as soon as its download finishes. in_flight bounds how many
+        # downloaded PDFs can be waiting for (or in) upload at once.
+        in_flight = threading.BoundedSemaphore(self.upload_queue_size)
+        with ThreadPoolExecutor(max_workers=self.download_concurrency, thread_name_prefix='download') as downloads, \
+                ThreadPoolExecutor(max_workers=self.upload_concurrency, thread_name_prefix='upload') as uploads:
+            download_futures = {
+                downloads.submit(self._download_stage, pdf_info, s3_key, stats, in_flight): (cert_data, pdf_info, s3_key)
+                for cert_data, pdf_info, s3_key in work
+            }
+            
+            upload_futures = []
+            for future in as_completed(download_futures):
+                cert_data, pdf_info, s3_key = download_futures[future]
+                try:
+                    pdf_content = future.result()
+                except Exception as e:
+                    logger.error(f"Unexpected error downloading {pdf_info['url']}: {e}")
+                    in_flight.release()
+                    with self._lock:
+                        stats['errors'] += 1
                     continue
                 
-                stats['pdfs_downloaded'] += 1
-                
-                # Generate S3 key
-                s3_key = self.generate_s3_key(cert_data, pdf_info)
-                
-                # Prepare metadata
-                metadata = {
-                    'certificate_number': cert_data['certificate_number'],
-                    'company_name': cert_data['company_name'],
-                    'country': cert_data['country'],
-                    'pdf_type': pdf_info['type'],
-                    'source_url': pdf_url,
-                    'scraped_date': datetime.now().isoformat()
-                }
-                
-                # Upload to S3
-                if self.upload_to_s3(pdf_content, s3_key, metadata):
-                    stats['pdfs_uploaded'] += 1
-                    self.processed_pdfs.add(url_hash)
-                else:
-                    stats['errors'] += 1
-                
-                pdf_count += 1
-                
-                # Small delay to be respectful
-                time.sleep(1)
+                if pdf_content is not None:
+                    upload_futures.append(uploads.submit(
+                        self._upload_stage, cert_data, pdf_info, s3_key, pdf_content, stats, in_flight
+                    ))
+            
+            for future in as_completed(upload_futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Unexpected error uploading PDF: {e}")
+                    with self._lock:
+                        stats['errors'] += 1
         
         return stats
 
+    def s3_object_exists(self, s3_key: str, pdf_url: str) -> bool:
+        """
+        Check whether a PDF is already in S3, so it need not be downloaded again
+        
+        Args:
+            s3_key: S3 key the PDF would be uploaded to
+            pdf_url: URL of the PDF, whose Content-Length is compared when available
+            
+        Returns:
+            True if the object exists and matches the remote size
+        """
+        try:
+            head = self.s3_client.head_object(Bucket=self.s3_bucket, Key=s3_key)
+        except ClientError as e:
+            # Without s3:ListBucket a missing key is reported as 403, so that is "unknown" too
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound', '403', 'Forbidden', 'AccessDenied'):
+                return False
+            raise
+        
+        # Re-fetch if the remote PDF has changed size; trust the object if that can't be told
+        self.rate_limiter.acquire()
+        try:
+            response = self.session.head(pdf_url, allow_redirects=True, timeout=10)
+            remote_size = response.headers.get('Content-Length')
+        except requests.exceptions.RequestException:
+            return True
+        return remote_size is None or int(remote_size) == head['ContentLength']
+
+    def _download_stage(self, pdf_info: Dict, s3_key: str, stats: Dict,
+                        in_flight: threading.BoundedSemaphore) -> Optional[BinaryIO]:
+        """
+        Download a single PDF (runs in the download pool)
+        
+        Args:
+            pdf_info: PDF information
+            s3_key: S3 key the PDF will be uploaded to
+            stats: Processing statistics, updated under the scraper lock
+            in_flight: Slot held from download start until the upload finishes
+            
+        Returns:
+            PDF file object, or None if the PDF is already in S3 or the download failed
+        """
+        pdf_url = pdf_info['url']
+        in_flight.acquire()
+        logger.info(f"Processing PDF: {pdf_url}")
+        
+        if self.s3_object_exists(s3_key, pdf_url):
+            logger.info(f"Skipping PDF already in S3: {s3_key}")
+            with self._lock:
+                stats['pdfs_skipped'] += 1
+                self.processed_pdfs.add(pdf_url)
+                self._log_progress(pdf_url)
+            in_flight.release()
+            return None
+        
+        self.rate_limiter.acquire()
+        pdf_content = self.download_pdf(pdf_url)
+        
+        with self._lock:
+            if pdf_content:
+                stats['pdfs_downloaded'] += 1
+            else:
+                stats['errors'] += 1
+        
+        if not pdf_content:
+            in_flight.release()
+            return None
+        return pdf_content
+
+    def _upload_stage(self, cert_data: Dict, pdf_info: Dict, s3_key: str, pdf_content: BinaryIO,
+                      stats: Dict, in_flight: threading.BoundedSemaphore):
+        """
+        Upload a downloaded PDF to S3 (runs in the upload pool)
+        
+        Args:
+            cert_data: Certificate data
+            pdf_info: PDF information
+            s3_key: S3 key for the object
+            pdf_content: PDF file object, closed once uploaded
+            stats: Processing statistics, updated under the scraper lock
+            in_flight: Slot taken by the download stage, released here
+        """
+        try:
+            # Prepare metadata
+            metadata = {
+                'certificate_number': cert_data['certificate_number'],
+                'company_name': cert_data['company_name'],
+                'country': cert_data['country'],
+                'pdf_type': pdf_info['type'],
+                'source_url': pdf_info['url'],
+                'scraped_date': datetime.now().isoformat()
+            }
+            
+            # Upload to S3
+            with pdf_content:
+                uploaded = self.upload_to_s3(pdf_content, s3_key, metadata)
+        finally:
+            in_flight.release()
+        
+        with self._lock:
+            if uploaded:
+                stats['pdfs_uploaded'] += 1
+                self.processed_pdfs.add(pdf_info['url'])
+                self._log_progress(pdf_info['url'])
+            else:
+                stats['errors'] += 1
+
+    def _log_progress(self, pdf_url: str):
+        """Append a processed PDF to the progress log (caller holds _lock)"""
+        self._progress_fp.write(pdf_url + '\n')
+        self._unsynced += 1
+        if self._unsynced >= PROGRESS_FSYNC_INTERVAL:
+            os.fsync(self._progress_fp.fileno())
+            self._unsynced = 0
+
     def save_progress(self, filename: str = 'processed_pdfs.json'):
-        """Save processing progress to file"""
-        with open(filename, 'w') as f:
-            json.dump(list(self.processed_pdfs), f)
+        """Save processing progress to file and compact the progress log into it"""
+        with self._lock:
+            tmp = f"{filename}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(list(self.processed_pdfs), f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, filename)
+            
+            # Everything in the log is now in the JSON file
+            self._progress_fp.seek(0)
+            self._progress_fp.truncate()
+            self._unsynced = 0
 
     def load_progress(self, filename: str = 'processed_pdfs.json'):
-        """Load processing progress from file"""
+        """Load processing progress from file, plus anything logged since it was saved"""
         try:
             with open(filename, 'r') as f:
                 self.processed_pdfs = set(json.load(f))
         except FileNotFoundError:
             logger.info("No previous progress file found")
+        
+        with open(self._progress_log, 'r') as f:
+            self.processed_pdfs.update(line.strip() for line in f if line.strip())
 
 
 def main():
@@ -480,6 +882,10 @@ def main():
         'scraping_service': os.getenv('SCRAPING_SERVICE', 'selenium'),  # 'brightdata', 'tavily', or 'selenium'
         'brightdata_api_key': os.getenv('BRIGHTDATA_API_KEY'),  # Optional
         'tavily_api_key': os.getenv('TAVILY_API_KEY'),  # Optional
+        
+        # Pipeline concurrency
+        'download_concurrency': os.getenv('DOWNLOAD_CONCURRENCY', 16),
+        'upload_concurrency': os.getenv('UPLOAD_CONCURRENCY', 16),
     }
     
     # Validate configuration
@@ -490,29 +896,28 @@ def main():
             return
     
     # Initialize scraper
-    scraper = ISCCPDFScraper(config)
-    
-    # Load previous progress if exists
-    scraper.load_progress()
-    
-    try:
-        # Process certificates (limit to 50 PDFs for testing)
-        logger.info("Starting ISCC certificate PDF scraping...")
-        stats = scraper.process_certificates(max_pdfs=50)  # Remove limit for full scrape
-        
-        # Print statistics
-        logger.info("Scraping completed!")
-        logger.info(f"Statistics: {json.dumps(stats, indent=2)}")
-        
-        # Save progress
-        scraper.save_progress()
-        
-    except KeyboardInterrupt:
-        logger.info("Scraping interrupted by user")
-        scraper.save_progress()
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
-        scraper.save_progress()
+    with ISCCPDFScraper(config) as scraper:
+        # Load previous progress if exists
+        scraper.load_progress()
+        
+        try:
+            # Process certificates (limit to 50 PDFs for testing)
+            logger.info("Starting ISCC certificate PDF scraping...")
+            stats = scraper.process_certificates(max_pdfs=50)  # Remove limit for full scrape
+            
+            # Print statistics
+            logger.info("Scraping completed!")
+            logger.info(f"Statistics: {json.dumps(stats, indent=2)}")
+            
+            # Save progress
+            scraper.save_progress()
+            
+        except KeyboardInterrupt:
+            logger.info("Scraping interrupted by user")
+            scraper.save_progress()
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}")
+            scraper.save_progress()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,130 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+agent = pytest.importorskip("BedrockAgent")
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+
+
+def _config(thread_id="t", checkpoint_id=None):
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def _checkpoint(checkpoint_id, messages):
+    checkpoint = empty_checkpoint()
+    checkpoint["id"] = checkpoint_id
+    checkpoint["channel_values"] = {"messages": messages, "other": 1}
+    return checkpoint
+
+
+def _put(saver, checkpoint_id, messages, parent_id=None, thread_id="t"):
+    return saver.put(_config(thread_id, parent_id), _checkpoint(checkpoint_id, messages), {"step": 0}, {})
+
+
+def _messages(saver, checkpoint_id=None, thread_id="t"):
+    return saver.get_tuple(_config(thread_id, checkpoint_id)).checkpoint["channel_values"]["messages"]
+
+
+def test_delta_saver_round_trip():
+    saver = agent.DeltaSaver()
+    m1 = HumanMessage(content="hi", id="m1")
+    m2 = AIMessage(content="hello", id="m2")
+    _put(saver, "1", [m1])
+    _put(saver, "2", [m1, m2], parent_id="1")
+
+    assert _messages(saver) == [m1, m2]
+    assert _messages(saver, "1") == [m1]
+    assert saver.storage[("t", "")]["2"]["base_id"] == "1"
+
+    latest = saver.get_tuple(_config())
+    assert latest.checkpoint["channel_values"]["other"] == 1
+    assert latest.parent_config["configurable"]["checkpoint_id"] == "1"
+
+
+def test_delta_saver_detects_replaced_message():
+    saver = agent.DeltaSaver()
+    m1 = HumanMessage(content="hi", id="m1")
+    m2 = AIMessage(content="hello", id="m2")
+    _put(saver, "1", [m1, m2])
+
+    edited = AIMessage(content="edited", id="m2")
+    _put(saver, "2", [m1, edited, HumanMessage(content="next", id="m3")], parent_id="1")
+
+    assert saver.storage[("t", "")]["2"]["base_id"] is None
+    assert [m.content for m in _messages(saver)] == ["hi", "edited", "next"]
+
+
+def test_delta_saver_resumes_from_loaded_head():
+    saver = agent.DeltaSaver()
+    _put(saver, "1", [HumanMessage(content="hi", id="m1")])
+
+    loaded = _messages(saver)
+    _put(saver, "2", [*loaded, AIMessage(content="hello", id="m2")], parent_id="1")
+
+    assert saver.storage[("t", "")]["2"]["base_id"] == "1"
+    assert [m.content for m in _messages(saver)] == ["hi", "hello"]
+
+
+def test_delta_saver_list():
+    saver = agent.DeltaSaver()
+    m1 = HumanMessage(content="hi", id="m1")
+    _put(saver, "1", [m1])
+    _put(saver, "2", [m1], parent_id="1")
+    _put(saver, "3", [m1], parent_id="2")
+    _put(saver, "1", [m1], thread_id="other")
+
+    ids = [t.config["configurable"]["checkpoint_id"] for t in saver.list(_config())]
+    assert ids == ["3", "2", "1"]
+    assert [t.config["configurable"]["checkpoint_id"] for t in saver.list(_config(), limit=1)] == ["3"]
+    assert [t.config["configurable"]["checkpoint_id"] for t in saver.list(_config(), before=_config(checkpoint_id="3"))] == ["2", "1"]
+    assert len(list(saver.list(None))) == 4
+
+
+def test_delta_saver_put_writes():
+    saver = agent.DeltaSaver()
+    _put(saver, "1", [HumanMessage(content="hi", id="m1")])
+    saver.put_writes(_config(checkpoint_id="1"), [("messages", "a"), ("other", 2)], "task")
+
+    assert saver.get_tuple(_config()).pending_writes == [("task", "messages", "a"), ("task", "other", 2)]
+
+
+def test_deferred_saver_stores_last_checkpoint_on_flush():
+    saver = agent.DeferredSaver()
+    m1 = HumanMessage(content="hi", id="m1")
+    m2 = AIMessage(content="hello", id="m2")
+    _put(saver, "1", [m1])
+    saver.flush("t")
+
+    _put(saver, "2", [m1], parent_id="1")
+    _put(saver, "3", [m1, m2], parent_id="2")
+    saver.put_writes(_config(checkpoint_id="3"), [("other", 2)], "task")
+    assert saver.get_tuple(_config()).config["configurable"]["checkpoint_id"] == "1"
+
+    saver.flush("t")
+    latest = saver.get_tuple(_config())
+    assert latest.config["configurable"]["checkpoint_id"] == "3"
+    assert latest.parent_config["configurable"]["checkpoint_id"] == "1"
+    assert latest.pending_writes == [("task", "other", 2)]
+    assert "2" not in saver.storage[("t", "")]
+    assert _messages(saver) == [m1, m2]
+
+
+def test_sharded_saver_round_trip():
+    saver = agent.ShardedSaver(num_shards=4)
+    for thread_id in ("a", "b", "c"):
+        _put(saver, "1", [HumanMessage(content=thread_id, id="m1")], thread_id=thread_id)
+        saver.flush(thread_id)
+
+    for thread_id in ("a", "b", "c"):
+        assert _messages(saver, thread_id=thread_id)[0].content == thread_id
+    assert len(list(saver.list(None))) == 3
+
+    saver.delete_thread("a")
+    assert saver.get_tuple(_config("a")) is None
@@ -0,0 +1,57 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+for dependency in ("boto3", "lxml", "requests", "selenium"):
+    pytest.importorskip(dependency)
+
+SCRAPER_PATH = Path(__file__).resolve().parents[1] / "ISCC Scraping" / "scraper.py"
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    # The module and the scraper write their log / progress files to the working directory
+    monkeypatch.chdir(tmp_path)
+    spec = importlib.util.spec_from_file_location("iscc_scraper", SCRAPER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    instance = module.ISCCPDFScraper({
+        "s3_bucket_name": "bucket",
+        "aws_region": "us-east-1",
+        "aws_access_key_id": "key",
+        "aws_secret_access_key": "secret",
+    })
+    yield instance
+    instance.close()
+
+
+def test_extract_certificate_data_strips_each_text_node(scraper):
+    html = """
+    <table>
+      <tr><th>Number</th><th>Company</th><th>Country</th><th>Valid</th><th>Body</th><th>Docs</th></tr>
+      <tr>
+        <td> EU-ISCC-Cert-DE105-1 </td>
+        <td>Foo <b>GmbH</b>
+ &amp; Co</td>
+        <td>Germany</td>
+        <td>2024 - 2025</td>
+        <td>Body</td>
+        <td><a href="/docs/audit.PDF">Audit <span>summary</span></a><a href="/docs/page.html">Page</a></td>
+      </tr>
+      <tr><td>too</td><td>short</td></tr>
+    </table>
+    """
+
+    certificates = scraper.extract_certificate_data(html)
+
+    assert len(certificates) == 1
+    cert = certificates[0]
+    assert cert["certificate_number"] == "EU-ISCC-Cert-DE105-1"
+    assert cert["company_name"] == "FooGmbH& Co"
+    assert cert["pdf_links"] == [{
+        "url": "https://www.iscc-system.org/docs/audit.PDF",
+        "text": "Auditsummary",
+        "type": "audit_report",
+    }]
@@ -0,0 +1,58 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+agent = pytest.importorskip("BedrockAgent")
+from langchain_core.tools import StructuredTool
+
+
+def _tool(results):
+    calls = []
+
+    async def retrieve_documents(query: str, limit: int = 3):
+        """Search the knowledge base"""
+        calls.append((query, limit))
+        return results[len(calls) - 1]
+
+    return StructuredTool.from_function(coroutine=retrieve_documents), calls
+
+
+def _text_block(payload):
+    return [{"type": "text", "text": json.dumps(payload)}]
+
+
+def _run_twice(inner):
+    cached = agent._caching_tool(inner, agent.ToolResultCache())
+
+    async def run():
+        first = await cached.ainvoke({"query": "iscc", "limit": 3})
+        second = await cached.ainvoke({"query": "iscc", "limit": 3})
+        return first, second
+
+    return asyncio.run(run())
+
+
+def test_caching_tool_reuses_successful_mcp_result():
+    ok = _text_block({"query": "iscc", "results": []})
+    inner, calls = _tool([ok, ok])
+
+    assert _run_twice(inner) == (ok, ok)
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("error", [
+    _text_block({"error": "Search failed: boom", "query": "iscc", "results": []}),
+    json.dumps({"error": "Search failed: boom"}),
+    {"error": "Search failed: boom"},
+])
+def test_caching_tool_does_not_keep_error_results(error):
+    ok = _text_block({"query": "iscc", "results": []})
+    inner, calls = _tool([error, ok])
+
+    assert _run_twice(inner) == (error, ok)
+    assert len(calls) == 2